@@ -2,13 +2,25 @@
 # This file is a template: place it at "day**" and replace the specified function
 from __future__ import annotations
 
+import bisect
+import heapq
+import io
+import itertools
+import math
+import os
+import random
 import sys
+import time
 import typing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from pathlib import Path
 
+import numpy as np
+
 if typing.TYPE_CHECKING:
-    ...
+    from collections.abc import Iterator
 
 
 class Part(Enum):
@@ -16,7 +28,537 @@ class Part(Enum):
     P2 = "P2"
 
 
-def advent_p1(input: str) -> str:
+class Engine(Enum):
+    STREAM = "STREAM"
+    NUMPY = "NUMPY"
+    PARALLEL = "PARALLEL"
+
+
+# amount of characters read at once when streaming the inventory
+CHUNK_SIZE = 1 << 16
+# "index" is the zero-based position of the Elf in the inventory
+Elf = namedtuple("Elf", ("index", "calories"))
+# biggest byte range handed to a single worker by the parallel engine
+PARALLEL_CHUNK_SIZE = 1 << 26
+# summary of a byte range of the inventory: "groups" is the number of Elves (or pieces of
+# them) found in it, "first" and "last" are the totals of the outermost ones, which can
+# continue in the neighbouring ranges, and "top" holds the best inner Elves, indexed from
+# the first group of the range. "leading" and "trailing" tell whether there is a blank line
+# before the first group or after the last one
+Chunk = namedtuple("Chunk", ("groups", "first", "last", "top", "leading", "trailing"))
+# 10 ** 18 is the biggest power of ten that fits in an int64
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+
+class CalorieStream:
+    """Incremental parser for the Elves' inventory.
+
+    Text can be fed in chunks of any size: an unfinished line is kept aside until its line
+    break arrives, and only the running total of the Elf being read is held in memory. Each
+    call to :meth:`feed` returns the totals of the Elves whose inventory got closed by a blank
+    line, so memory is bounded by the chunk size and not by the inventory size.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._current = 0
+        self._open = False
+
+    def feed(self, chunk: str) -> list[int]:
+        lines = (self._pending + chunk).split("\n")
+        # last item is either empty or an unfinished line
+        self._pending = lines.pop()
+        totals: list[int] = []
+        for line in lines:
+            if line.strip():
+                self._current += int(line)
+                self._open = True
+            elif self._open:
+                totals.append(self._current)
+                self._current, self._open = 0, False
+
+        return totals
+
+    def close(self) -> list[int]:
+        totals = self.feed("\n") if self._pending else []
+        if self._open:
+            totals.append(self._current)
+            self._current, self._open = 0, False
+
+        return totals
+
+    @property
+    def current(self) -> int | None:
+        """Running total of the Elf being read, or ``None`` if no Elf is open"""
+        return self._current if self._open else None
+
+
+def iter_elves(source: str | typing.TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[int]:
+    """Yields the total Calories carried by each Elf, in inventory order.
+
+    ``source`` can either be the whole inventory or an open file, which is then read
+    ``chunk_size`` characters at a time so arbitrarily large inventories can be processed.
+    """
+    stream = CalorieStream()
+    if isinstance(source, str):
+        for i in range(0, len(source), chunk_size):
+            yield from stream.feed(source[i : i + chunk_size])
+    else:
+        while chunk := source.read(chunk_size):
+            yield from stream.feed(chunk)
+
+    yield from stream.close()
+
+
+def elf_totals(data: bytes) -> np.ndarray:
+    """Computes the total Calories carried by every Elf with vectorized operations.
+
+    Every number in ``data`` is located by the edges of its run of digits, and all of them
+    are decoded together into an ``int64`` array by adding their digits from the right, one
+    digit position at a time. Once everything but digits and line breaks is dropped, two
+    consecutive numbers belong to different Elves when more than one line break (a blank
+    line) separates them, which gives the group boundaries for ``np.add.reduceat``.
+    """
+    starts, ends, calories, _ = _decode(data)
+    if calories.size == 0:
+        return calories
+
+    groups = np.flatnonzero(starts[1:] - ends[:-1] > 1) + 1
+    return np.add.reduceat(calories, np.concatenate(([0], groups)))
+
+
+def _decode(data: bytes) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Returns where every number starts and ends, its value and the length of the buffer
+    once everything that is neither a digit nor a line break has been dropped
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    digits = (buffer - ord("0")) < 10
+    if not (keep := digits | (buffer == ord("\n"))).all():
+        # spaces, carriage returns, etc.
+        buffer, digits = buffer[keep], digits[keep]
+
+    edges = np.flatnonzero(np.diff(digits, prepend=False, append=False))
+    starts, ends = edges[0::2], edges[1::2]
+    calories = np.zeros(starts.size, dtype=np.int64)
+    if starts.size == 0:
+        return starts, ends, calories, buffer.size
+
+    lengths = ends - starts
+    for position, power in enumerate(POWERS_OF_TEN[: lengths.max()]):
+        digit = buffer[ends - position - 1] - ord("0")
+        digit[lengths <= position] = 0
+        calories += digit * power
+
+    return starts, ends, calories, buffer.size
+
+
+def _read_bytes(source: str | typing.TextIO) -> bytes:
+    data = source if isinstance(source, str) else source.read()
+    return data.encode() if isinstance(data, str) else data
+
+
+def _top_k_numpy(totals: np.ndarray, k: int) -> list[Elf]:
+    if k < totals.size:
+        # partition selection: everything above the k-th best total is in, and ties on
+        # the k-th total are solved in favour of the first Elves
+        kth = np.partition(totals, totals.size - k)[totals.size - k]
+        greater = np.flatnonzero(totals > kth)
+        equal = np.flatnonzero(totals == kth)[: k - greater.size]
+        candidates = np.concatenate((greater, equal))
+    else:
+        candidates = np.arange(totals.size)
+
+    candidates = candidates[np.lexsort((candidates, -totals[candidates]))]
+    return [Elf(int(index), int(totals[index])) for index in candidates]
+
+
+def _byte_ranges(size: int, chunks: int, next_line: typing.Callable[[int], int]) -> list[int]:
+    # every boundary is moved forward to the beginning of a line, so no number is split
+    bounds = {0, size}
+    for i in range(1, chunks):
+        bounds.add(next_line(size * i // chunks))
+
+    return sorted(bounds)
+
+
+def _summarize(task: bytes | tuple[str, int, int], k: int) -> Chunk:
+    if isinstance(task, bytes):
+        data = task
+    else:
+        path, start, end = task
+        with open(path, "rb") as fd:
+            fd.seek(start)
+            data = fd.read(end - start)
+
+    starts, ends, calories, size = _decode(data)
+    if calories.size == 0:
+        # ranges start at the beginning of a line, so any line break is a blank line
+        return Chunk(0, 0, 0, [], size > 0, size > 0)
+
+    bounds = np.flatnonzero(starts[1:] - ends[:-1] > 1) + 1
+    totals = np.add.reduceat(calories, np.concatenate(([0], bounds)))
+    return Chunk(
+        groups=totals.size,
+        first=int(totals[0]),
+        last=int(totals[-1]),
+        top=_top_k_numpy(totals[1:-1], k),
+        leading=bool(starts[0] > 0),
+        trailing=bool(size - ends[-1] > 1),
+    )
+
+
+def _merge(chunks: typing.Iterable[Chunk], k: int) -> list[Elf]:
+    candidates: list[Elf] = []
+    count = carry = 0
+    is_open = False
+
+    def close():
+        nonlocal count, carry, is_open
+        if is_open:
+            candidates.append(Elf(count, carry))
+            count, carry, is_open = count + 1, 0, False
+
+    for chunk in chunks:
+        if chunk.leading:
+            close()
+        if chunk.groups == 0:
+            continue
+
+        carry, is_open = carry + chunk.first, True
+        if chunk.groups > 1:
+            close()
+            candidates.extend(Elf(count + elf.index, elf.calories) for elf in chunk.top)
+            count += chunk.groups - 2
+            carry, is_open = chunk.last, True
+        if chunk.trailing:
+            close()
+
+    close()
+    return heapq.nlargest(k, candidates, key=lambda elf: (elf.calories, -elf.index))
+
+
+def parallel_top_k(
+    source: str | Path | typing.TextIO, k: int, workers: int | None = None
+) -> list[Elf]:
+    """Finds the ``k`` Elves carrying the most Calories using a pool of processes.
+
+    The inventory is split into byte ranges that start at the beginning of a line. Every
+    worker decodes its range with the NumPy engine and reports the Elves at its edges,
+    which may continue in the neighbouring ranges, along with its own best ``k`` inner
+    Elves. The summaries are then stitched together in order, so the result (indices
+    included) is the same as the one of the serial engines.
+
+    ``source`` is either the inventory itself, a path or an open file: files are never
+    fully loaded by the parent process, as workers read their own range.
+    """
+    workers = workers or os.cpu_count() or 1
+    if isinstance(source, io.TextIOWrapper):
+        source = Path(source.name)
+    elif not isinstance(source, (str, Path)):
+        source = source.read()
+
+    tasks: list[bytes | tuple[str, int, int]]
+    if isinstance(source, Path):
+        size = source.stat().st_size
+        chunks = max(workers, -(-size // PARALLEL_CHUNK_SIZE))
+        with source.open("rb") as fd:
+
+            def next_line(offset: int) -> int:
+                fd.seek(offset)
+                fd.readline()
+                return fd.tell()
+
+            bounds = _byte_ranges(size, chunks, next_line)
+        tasks = [(str(source), start, end) for start, end in zip(bounds, bounds[1:])]
+    else:
+        data = source.encode()
+        chunks = max(workers, -(-len(data) // PARALLEL_CHUNK_SIZE))
+
+        def next_line(offset: int) -> int:
+            end = data.find(b"\n", offset)
+            return len(data) if end == -1 else end + 1
+
+        bounds = _byte_ranges(len(data), chunks, next_line)
+        tasks = [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = executor.map(_summarize, tasks, [k] * len(tasks))
+        return _merge(summaries, k)
+
+
+def top_k_elves(source: str | typing.TextIO, k: int, engine: Engine = Engine.STREAM) -> list[Elf]:
+    """Finds the ``k`` Elves carrying the most Calories, best first.
+
+    With :attr:`Engine.STREAM` a bounded heap of size ``k`` is kept while the inventory is
+    streamed, so the selection runs in ``O(n log k)`` time and ``O(k)`` memory. With
+    :attr:`Engine.NUMPY` the whole inventory is loaded and the totals are selected with
+    a linear-time partition, and :attr:`Engine.PARALLEL` spreads that work over a pool of
+    processes (see :func:`parallel_top_k`). In all cases ties are broken in favour of the
+    Elf that appears first in the inventory.
+    """
+    if k < 1:
+        raise ValueError(f"k must be a positive number, got {k}")
+
+    match engine:
+        case Engine.STREAM:
+            elves = (Elf(index, calories) for index, calories in enumerate(iter_elves(source)))
+            return heapq.nlargest(k, elves, key=lambda elf: (elf.calories, -elf.index))
+        case Engine.NUMPY:
+            return _top_k_numpy(elf_totals(_read_bytes(source)), k)
+        case Engine.PARALLEL:
+            return parallel_top_k(source, k)
+        case _:
+            raise SystemError(f"Impossible pattern {engine}")
+
+
+class Leaderboard:
+    """Best ``k`` Elves of an inventory file that keeps growing.
+
+    The byte offset already read and the state of the parser are kept between calls to
+    :meth:`refresh`, which only reads the bytes appended since the previous call. The
+    finished Elves are kept in a bounded heap, so each refresh costs time proportional to
+    the new data. An unfinished last line is held back until its line break is written,
+    whereas the last Elf of the file counts with the Calories read so far, as it might
+    well be complete. If the file shrinks, it is considered rewritten and read again.
+    """
+
+    def __init__(self, path: str | Path, k: int = 3):
+        if k < 1:
+            raise ValueError(f"k must be a positive number, got {k}")
+
+        self.path = Path(path)
+        self.k = k
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.elves = 0
+        self._stream = CalorieStream()
+        # min-heap of (calories, -index), so the worst of the best Elves is at the root
+        self._heap: list[tuple[int, int]] = []
+
+    def _push(self, calories: int):
+        entry = (calories, -self.elves)
+        self.elves += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heappushpop(self._heap, entry)
+
+    def refresh(self) -> bool:
+        """Reads the newly appended data, returning whether there was any"""
+        with self.path.open("rb") as fd:
+            if fd.seek(0, os.SEEK_END) < self.offset:
+                self.reset()
+
+            fd.seek(self.offset)
+            read = 0
+            while chunk := fd.read(CHUNK_SIZE):
+                read += len(chunk)
+                for calories in self._stream.feed(chunk.decode()):
+                    self._push(calories)
+
+        self.offset += read
+        return read > 0
+
+    @property
+    def top(self) -> list[Elf]:
+        entries = list(self._heap)
+        if (current := self._stream.current) is not None:
+            entries.append((current, -self.elves))
+
+        return [Elf(-index, calories) for calories, index in heapq.nlargest(self.k, entries)]
+
+
+def follow(path: Path, part: Part, interval: float = 1.0):
+    """Prints the answer for ``part`` every time new Elves are appended to ``path``"""
+    leaderboard = Leaderboard(path, 1 if part is Part.P1 else 3)
+    while True:
+        if leaderboard.refresh():
+            print(sum(elf.calories for elf in leaderboard.top), flush=True)
+
+        time.sleep(interval)
+
+
+class ExactQuantiles:
+    """Quantiles and histograms of the Elves' totals computed from all of them.
+
+    Every total is kept, so this is meant for small inventories or for checking the
+    results of :class:`QuantileSketch`.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self._totals: list[int] = []
+        self._sorted = True
+
+    def update(self, calories: int):
+        self._totals.append(calories)
+        self._sorted = False
+        self.n += 1
+
+    def _items(self) -> tuple[list[int], typing.Sequence[int]]:
+        if not self._sorted:
+            self._totals.sort()
+            self._sorted = True
+
+        # every total stands for a single Elf
+        return self._totals, range(1, self.n + 1)
+
+    def rank(self, calories: int, inclusive: bool = False) -> int:
+        """Amount of Elves carrying less (or, if ``inclusive``, up to) ``calories``"""
+        items, cumulative = self._items()
+        position = (bisect.bisect_right if inclusive else bisect.bisect_left)(items, calories)
+        return cumulative[position - 1] if position else 0
+
+    def quantile(self, q: float) -> int:
+        """Smallest total such that at least a fraction ``q`` of the Elves carry up to it"""
+        if not 0 <= q <= 1:
+            raise ValueError(f"quantile must be in [0, 1], got {q}")
+        if self.n == 0:
+            raise ValueError("no Elves have been seen yet")
+
+        items, cumulative = self._items()
+        target = max(math.ceil(q * self.n), 1)
+        return items[min(bisect.bisect_left(cumulative, target), len(items) - 1)]
+
+    def histogram(self, edges: typing.Sequence[int]) -> list[int]:
+        """Amount of Elves per bin, with bins ``[edges[i], edges[i + 1])`` except for the
+        last one, which also includes its right edge (as in ``numpy.histogram``)
+        """
+        ranks = [self.rank(edge) for edge in edges[:-1]]
+        ranks.append(self.rank(edges[-1], inclusive=True))
+        return [upper - lower for lower, upper in zip(ranks, ranks[1:])]
+
+
+class QuantileSketch(ExactQuantiles):
+    """Streaming KLL sketch (Karnin, Lang and Liberty) of the Elves' totals.
+
+    Totals go into a hierarchy of compactors: when one is full it is sorted and every
+    other item, starting at a random offset, is promoted to the next level, where each
+    item stands for twice as many Elves. Compactor capacities shrink geometrically (by
+    ``c``) with their distance to the top level, so only ``O(k)`` totals are kept no
+    matter how many Elves are seen.
+
+    The error is on ranks: a quantile ``q`` is answered with a total whose true rank is
+    within ``q ± ε`` with ``ε ≈ 1.65 / k`` (99% confidence), so about ±1.65% for the
+    default ``k = 200``. Histogram counts are off by at most ``2εn`` per bin. Sketches are
+    mergeable, so partial sketches built over parts of an inventory can be combined.
+    """
+
+    def __init__(self, k: int = 200, c: float = 2 / 3, seed: int | None = None):
+        super().__init__()
+        self.k = k
+        self.c = c
+        self._random = random.Random(seed)
+        self._compactors: list[list[int]] = []
+        self._cumulative: list[int] = []
+        self._size = self._max_size = 0
+        self._grow()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._compactors) - level - 1
+        return int(math.ceil(self.c**depth * self.k)) + 1
+
+    def _grow(self):
+        self._compactors.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self._compactors)))
+
+    def update(self, calories: int):
+        self._compactors[0].append(calories)
+        self._size += 1
+        self._sorted = False
+        self.n += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        for level, compactor in enumerate(self._compactors):
+            if len(compactor) < self._capacity(level):
+                continue
+
+            if level + 1 == len(self._compactors):
+                self._grow()
+
+            compactor.sort()
+            # an odd item out stays in this level
+            kept = [compactor.pop()] if len(compactor) % 2 else []
+            self._compactors[level + 1].extend(compactor[self._random.randint(0, 1) :: 2])
+            compactor[:] = kept
+            self._size = sum(len(compactor) for compactor in self._compactors)
+            # lazy compaction: only compact as much as needed to make room
+            if self._size < self._max_size:
+                break
+
+    def merge(self, other: QuantileSketch):
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+
+        for level, compactor in enumerate(other._compactors):
+            self._compactors[level].extend(compactor)
+
+        self.n += other.n
+        self._size = sum(len(compactor) for compactor in self._compactors)
+        self._sorted = False
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _items(self) -> tuple[list[int], typing.Sequence[int]]:
+        if not self._sorted:
+            weighted = sorted(
+                (item, 1 << level)
+                for level, compactor in enumerate(self._compactors)
+                for item in compactor
+            )
+            self._totals = [item for item, _ in weighted]
+            self._cumulative = list(itertools.accumulate(weight for _, weight in weighted))
+            self._sorted = True
+
+        return self._totals, self._cumulative
+
+    def quantile(self, q: float) -> int:
+        if not 0 <= q <= 1:
+            raise ValueError(f"quantile must be in [0, 1], got {q}")
+        if self.n == 0:
+            raise ValueError("no Elves have been seen yet")
+
+        items, cumulative = self._items()
+        # compacted weights add up to (roughly) the amount of Elves seen
+        target = max(math.ceil(q * cumulative[-1]), 1)
+        return items[min(bisect.bisect_left(cumulative, target), len(items) - 1)]
+
+
+def quantiles(
+    source: str | typing.TextIO,
+    qs: typing.Iterable[float] = (0.5, 0.9, 0.99),
+    exact: bool = False,
+    k: int = 200,
+) -> list[int]:
+    """Quantiles ``qs`` of the Elves' totals, approximated in bounded memory with a
+    :class:`QuantileSketch` of size ``k`` unless ``exact`` is requested
+    """
+    sketch = ExactQuantiles() if exact else QuantileSketch(k)
+    for calories in iter_elves(source):
+        sketch.update(calories)
+
+    return [sketch.quantile(q) for q in qs]
+
+
+def histogram(
+    source: str | typing.TextIO, edges: typing.Sequence[int], exact: bool = False, k: int = 200
+) -> list[int]:
+    """Amount of Elves whose total falls in each of the bins given by ``edges``, approximated
+    in bounded memory with a :class:`QuantileSketch` of size ``k`` unless ``exact`` is
+    requested
+    """
+    sketch = ExactQuantiles() if exact else QuantileSketch(k)
+    for calories in iter_elves(source):
+        sketch.update(calories)
+
+    return sketch.histogram(edges)
+
+
+def advent_p1(input: str | typing.TextIO, engine: Engine = Engine.STREAM) -> str:
     """
     The jungle must be too overgrown and difficult to navigate in vehicles
     or access from the air; the Elves' expedition traditionally goes on foot.
@@ -62,12 +604,11 @@ def advent_p1(input: str) -> str:
 
     Find the Elf carrying the most Calories. How many total Calories is that Elf carrying?
     """
-    return max(
-        (sum((int(calories) for calories in elf_data.split())) for elf_data in input.split("\n\n"))
-    )
+    elves = top_k_elves(input, 1, engine)
+    return elves[0].calories if elves else 0
 
 
-def advent_p2(input: str) -> str:
+def advent_p2(input: str | typing.TextIO, engine: Engine = Engine.STREAM) -> str:
     """By the time you calculate the answer to the Elves' question, they've already realized
     that the Elf carrying the most Calories of food might eventually run out of snacks.
 
@@ -82,25 +623,26 @@ def advent_p2(input: str) -> str:
     Find the top three Elves carrying the most Calories. How many Calories are those Elves
     carrying in total?
     """
-    return sum(
-        sorted(
-            (
-                sum((int(calories) for calories in elf_data.split()))
-                for elf_data in input.split("\n\n")
-            ),
-            reverse=True,
-        )[:3]
-    )
+    return sum(elf.calories for elf in top_k_elves(input, 3, engine))
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) in {2, 3}, f"usage: {sys.argv[0]} INPUT_FILE [P1/P2]"
+    usage = f"usage: {sys.argv[0]} INPUT_FILE [P1/P2] [STREAM/NUMPY/PARALLEL/FOLLOW]"
+    assert len(sys.argv) in {2, 3, 4}, usage
     file = Path(sys.argv[1])
-    part = Part(sys.argv[2]) if len(sys.argv) == 3 else Part.P1
+    part = Part(sys.argv[2]) if len(sys.argv) >= 3 else Part.P1
 
     assert file.exists(), f'input file "{file}" does not exist'
     assert file.is_file(), f'input file "{file}" is not a file'
 
+    if len(sys.argv) == 4 and sys.argv[3] == "FOLLOW":
+        try:
+            follow(file, part)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    engine = Engine(sys.argv[3]) if len(sys.argv) == 4 else Engine.STREAM
+
     with file.open() as fd:
         match part:
             case Part.P1:
@@ -110,6 +652,7 @@ if __name__ == "__main__":
             case _:
                 raise SystemError(f"Impossible pattern {part}")
 
-        print(fn(fd.read()))
+        # when streaming, the inventory is never fully loaded into memory
+        print(fn(fd, engine))
 
     sys.exit(0)
@@ -2,11 +2,21 @@
 # This file is a template: place it at "day**" and replace the specified function
 from __future__ import annotations
 
+import csv
+import glob
+import itertools
+import json
+import os
+import re
 import sys
 import typing
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from pathlib import Path
 
+import numpy as np
+
 if typing.TYPE_CHECKING:
     ...
 
@@ -16,6 +26,18 @@ class Part(Enum):
     P2 = "P2"
 
 
+class Engine(Enum):
+    TABLE = "TABLE"
+    NUMPY = "NUMPY"
+    COUNT = "COUNT"
+    PACKED = "PACKED"
+
+
+class Format(Enum):
+    CSV = "CSV"
+    JSON = "JSON"
+
+
 class RPS(Enum):
     ROCK = "A"  # rock
     PAPER = "B"  # paper
@@ -107,7 +129,247 @@ class RPSChooser(Enum):
         return o.fight(a)
 
 
-def advent_p1(input: str) -> str:
+# score of every possible round, indexed as [opponent][response]: both columns become 0..2
+# by subtracting the character codes of "A" and "X" respectively. The enums above are only
+# used to build these tables, so rounds are scored without any per-round object
+P1_SCORES = tuple(
+    tuple(RPS.convert(response).fight(opponent) for response in "XYZ") for opponent in RPS
+)
+P2_SCORES = tuple(
+    tuple(RPSChooser(response).choose(opponent).fight(opponent) for response in "XYZ")
+    for opponent in RPS
+)
+
+
+# every possible round, as written in a strategy guide (in the same order as the tables)
+ROUNDS = tuple(f"{opponent} {response}".encode() for opponent in "ABC" for response in "XYZ")
+# amount of characters read at once when counting rounds
+CHUNK_SIZE = 1 << 20
+# a line with nothing but whitespace, which does not hold any round
+BLANK_LINE = re.compile(rb"^[ \t\r]*\n", re.MULTILINE)
+GuideScore = namedtuple("GuideScore", ("path", "p1", "p2"))
+
+
+def score(input: str, table: tuple[tuple[int, ...], ...]) -> int:
+    """Total score of a strategy guide, looking up each round in ``table``.
+
+    Blank lines and trailing whitespace are ignored, any other line that is not one of
+    :data:`ROUNDS` raises :class:`ValueError`.
+    """
+    scores = dict(zip(ROUNDS, itertools.chain.from_iterable(table)))
+    total = 0
+    for line in input.encode().splitlines():
+        if not (line := line.rstrip()):
+            continue
+        if (points := scores.get(line)) is None:
+            raise ValueError(f'Invalid round "{line.decode()}". Expected "<A/B/C> <X/Y/Z>"')
+        total += points
+
+    return total
+
+
+def score_numpy(input: str, table: tuple[tuple[int, ...], ...]) -> int:
+    """Total score of a strategy guide, scoring all the rounds at once.
+
+    A well-formed guide is a sequence of 4-byte ``"A X\\n"`` rounds, so its bytes are viewed
+    as an ``(N, 4)`` array whose first and third columns index ``table``. Any other layout
+    (ragged lines, CRLF line breaks, etc.) falls back to :func:`score`.
+    """
+    data = input.encode()
+    if len(data) % 4 == 3:
+        # missing line break at the end of the file
+        data += b"\n"
+
+    if len(data) % 4:
+        return score(input, table)
+
+    rounds = np.frombuffer(data, dtype=np.uint8).reshape(-1, 4)
+    if not ((rounds[:, 1] == ord(" ")).all() and (rounds[:, 3] == ord("\n")).all()):
+        return score(input, table)
+
+    opponent, response = rounds[:, 0] - ord("A"), rounds[:, 2] - ord("X")
+    if (opponent > 2).any() or (response > 2).any():
+        return score(input, table)
+
+    return int(np.asarray(table)[opponent, response].sum())
+
+
+def count_rounds(source: str | typing.TextIO, chunk_size: int = CHUNK_SIZE) -> Counter[bytes]:
+    """Counts how many times each of the 9 possible rounds appears in a strategy guide.
+
+    The guide is read in chunks, cut at their last line break, and each round is counted
+    with a single ``bytes.count`` pass per chunk. Counters of different guides (or of parts
+    of the same guide) can be merged by just adding them.
+
+    Every chunk must hold as many rounds as non-blank lines, otherwise there is a line that
+    is not a round and :class:`ValueError` is raised.
+    """
+    if isinstance(source, str):
+        chunks = (source[i : i + chunk_size] for i in range(0, len(source), chunk_size))
+    else:
+        chunks = iter(lambda: source.read(chunk_size), "")
+
+    counts: Counter[bytes] = Counter()
+    pending = b""
+    for chunk in itertools.chain(chunks, ("\n",)):
+        data = pending + chunk.encode()
+        cut = data.rfind(b"\n") + 1
+        data, pending = data[:cut], data[cut:]
+        rounds = 0
+        for line in ROUNDS:
+            amount = data.count(line)
+            counts[line] += amount
+            rounds += amount
+
+        lines = data.count(b"\n")
+        if rounds != lines:
+            # blank lines are only looked for when the guide is not just rounds
+            lines -= len(BLANK_LINE.findall(data))
+        if rounds != lines:
+            raise ValueError(f"strategy guide has {rounds} rounds in {lines} lines")
+
+    return counts
+
+
+def score_counts(counts: Counter[bytes]) -> tuple[int, int]:
+    """Scores of both parts for a strategy guide whose rounds have been counted"""
+    p1 = p2 = 0
+    for line, amount in counts.items():
+        opponent, response = line[0] - ord("A"), line[2] - ord("X")
+        p1 += amount * P1_SCORES[opponent][response]
+        p2 += amount * P2_SCORES[opponent][response]
+
+    return p1, p2
+
+
+class PackedGuide:
+    """Strategy guide with every round packed into 4 bits.
+
+    Each round is stored as two 2-bit symbols (``opponent << 2 | response``, both in 0..2)
+    and two rounds share a byte, the first one in the low nibble. An odd guide is padded
+    with a ``0xF`` nibble, which is never a valid round. That is half a byte per round,
+    against the dozens of bytes of a Python string per line, and guides can be saved to
+    and loaded from disk, as well as scored directly under any 3x3 rule table.
+    """
+
+    MAGIC = b"RPS4"
+    PADDING = 0xF
+
+    def __init__(self, data: np.ndarray, rounds: int):
+        if data.size != (rounds + 1) // 2:
+            raise ValueError(f"{data.size} bytes cannot hold {rounds} rounds")
+
+        self.data = data
+        self.rounds = rounds
+
+    def __len__(self) -> int:
+        return self.rounds
+
+    @classmethod
+    def from_input(cls, input: str) -> PackedGuide:
+        # once whitespace is removed, a guide is just a sequence of "AX" pairs
+        symbols = np.frombuffer(input.encode().translate(None, b" \t\r\n"), dtype=np.uint8)
+        if symbols.size % 2:
+            raise ValueError("strategy guide has an incomplete round")
+
+        opponent, response = symbols[0::2] - ord("A"), symbols[1::2] - ord("X")
+        if (opponent > 2).any() or (response > 2).any():
+            raise ValueError('strategy guide has symbols other than "ABC" and "XYZ"')
+
+        rounds = opponent.size
+        nibbles = np.full(rounds + rounds % 2, cls.PADDING, dtype=np.uint8)
+        nibbles[:rounds] = opponent << 2 | response
+        return cls(nibbles[0::2] | nibbles[1::2] << 4, rounds)
+
+    def save(self, path: str | Path):
+        with open(path, "wb") as fd:
+            fd.write(self.MAGIC)
+            fd.write(self.rounds.to_bytes(8, "little"))
+            fd.write(self.data.tobytes())
+
+    @classmethod
+    def load(cls, path: str | Path) -> PackedGuide:
+        with open(path, "rb") as fd:
+            if (magic := fd.read(len(cls.MAGIC))) != cls.MAGIC:
+                raise ValueError(f'"{path}" is not a packed strategy guide (magic {magic!r})')
+
+            rounds = int.from_bytes(fd.read(8), "little")
+            return cls(np.frombuffer(fd.read(), dtype=np.uint8), rounds)
+
+    def score(self, table: tuple[tuple[int, ...], ...]) -> int:
+        """Total score of the guide under ``table``, computed straight from the packed bytes.
+
+        Every possible byte (a pair of rounds) is scored once into a 256-entry lookup table,
+        so the guide only takes a byte histogram and a dot product.
+        """
+        nibble_scores = np.zeros(16, dtype=np.int64)
+        for opponent, scores in enumerate(table):
+            for response, points in enumerate(scores):
+                nibble_scores[opponent << 2 | response] = points
+
+        codes = np.arange(256)
+        byte_scores = nibble_scores[codes & 0xF] + nibble_scores[codes >> 4]
+        return int(np.bincount(self.data, minlength=256) @ byte_scores)
+
+
+def solve(input: str, part: Part, engine: Engine = Engine.TABLE) -> int:
+    table = P1_SCORES if part is Part.P1 else P2_SCORES
+    match engine:
+        case Engine.TABLE:
+            return score(input, table)
+        case Engine.NUMPY:
+            return score_numpy(input, table)
+        case Engine.COUNT:
+            return score_counts(count_rounds(input))[0 if part is Part.P1 else 1]
+        case Engine.PACKED:
+            return PackedGuide.from_input(input).score(table)
+        case _:
+            raise SystemError(f"Impossible pattern {engine}")
+
+
+def find_guides(pattern: str) -> list[Path]:
+    """Strategy guides in the directory ``pattern`` or matching the glob ``pattern``"""
+    if (directory := Path(pattern)).is_dir():
+        return sorted(path for path in directory.iterdir() if path.is_file())
+
+    return sorted(
+        Path(path) for path in glob.glob(pattern, recursive=True) if Path(path).is_file()
+    )
+
+
+def _score_guide(path: Path) -> GuideScore:
+    with path.open() as fd:
+        return GuideScore(str(path), *score_counts(count_rounds(fd)))
+
+
+def score_guides(paths: typing.Iterable[Path], workers: int | None = None) -> list[GuideScore]:
+    """Scores many strategy guides with a pool of processes.
+
+    Workers are started once and reused for the whole batch, and guides are sent to them
+    in batches, so neither the interpreter startup nor the IPC round trip is paid per guide.
+    Each guide is streamed through :func:`count_rounds`, which gives both scores at once.
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(len(paths) // (4 * workers), 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_score_guide, paths, chunksize=chunksize))
+
+
+def write_scores(scores: list[GuideScore], fmt: Format, fd: typing.TextIO):
+    match fmt:
+        case Format.CSV:
+            writer = csv.writer(fd)
+            writer.writerow(GuideScore._fields)
+            writer.writerows(scores)
+        case Format.JSON:
+            json.dump([score._asdict() for score in scores], fd, indent=2)
+            fd.write("\n")
+        case _:
+            raise SystemError(f"Impossible pattern {fmt}")
+
+
+def advent_p1(input: str, engine: Engine = Engine.TABLE) -> str:
     """
     The Elves begin to set up camp on the beach. To decide whose tent gets to be closest
     to the snack storage, a giant Rock Paper Scissors tournament is already in progress.
@@ -156,10 +418,10 @@ def advent_p1(input: str) -> str:
 
     What would your total score be if everything goes exactly according to your strategy guide?
     """
-    return str(sum(RPS.from_input(v) for v in input.splitlines()))
+    return str(solve(input, Part.P1, engine))
 
 
-def advent_p2(input: str) -> str:
+def advent_p2(input: str, engine: Engine = Engine.TABLE) -> str:
     """The Elf finishes helping with the tent and sneaks back over to you. "Anyway, the second
     column says how the round needs to end: X means you need to lose, Y means you need to end
     the round in a draw, and Z means you need to win. Good luck!"
@@ -180,13 +442,27 @@ def advent_p2(input: str) -> str:
     Following the Elf's instructions for the second column, what would your total score be
     if everything goes exactly according to your strategy guide?
     """
-    return str(sum(RPSChooser.from_input(v) for v in input.splitlines()))
+    return str(solve(input, Part.P2, engine))
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) in {2, 3}, f"usage: {sys.argv[0]} INPUT_FILE [P1/P2]"
+    usage = (
+        f"usage: {sys.argv[0]} INPUT_FILE [P1/P2] [TABLE/NUMPY/COUNT/PACKED]\n"
+        f"       {sys.argv[0]} BATCH DIRECTORY/GLOB [CSV/JSON]"
+    )
+    assert len(sys.argv) in {2, 3, 4}, usage
+    if sys.argv[1] == "BATCH":
+        assert len(sys.argv) in {3, 4}, usage
+        guides = find_guides(sys.argv[2])
+        assert guides, f'no strategy guides found at "{sys.argv[2]}"'
+
+        fmt = Format(sys.argv[3]) if len(sys.argv) == 4 else Format.CSV
+        write_scores(score_guides(guides), fmt, sys.stdout)
+        sys.exit(0)
+
     file = Path(sys.argv[1])
-    part = Part(sys.argv[2]) if len(sys.argv) == 3 else Part.P1
+    part = Part(sys.argv[2]) if len(sys.argv) >= 3 else Part.P1
+    engine = Engine(sys.argv[3]) if len(sys.argv) == 4 else Engine.TABLE
 
     assert file.exists(), f'input file "{file}" does not exist'
     assert file.is_file(), f'input file "{file}" is not a file'
@@ -200,6 +476,6 @@ if __name__ == "__main__":
             case _:
                 raise SystemError(f"Impossible pattern {part}")
 
-        print(fn(fd.read()))
+        print(fn(fd.read(), engine))
 
     sys.exit(0)
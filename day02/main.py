@@ -2,13 +2,17 @@
 # This file is a template: place it at "day**" and replace the specified function
 from __future__ import annotations
 
+import io
+import string
 import sys
 import typing
 from enum import Enum
 from pathlib import Path
 
+import numpy as np
+
 if typing.TYPE_CHECKING:
-    ...
+    from collections.abc import Iterator
 
 
 class Part(Enum):
@@ -16,7 +20,171 @@ class Part(Enum):
     P2 = "P2"
 
 
-def advent_p1(input: str) -> str:
+class Engine(Enum):
+    NUMPY = "NUMPY"
+    MASK = "MASK"
+
+
+# every item type is a bit: lowercase "a" to "z" are bits 0 to 25 and uppercase "A" to "Z"
+# bits 26 to 51, so the priority of an item is the index of its bit plus one. The table is
+# indexed by character code, so no hashing is needed to look an item up
+ITEM_BITS = [0] * 128
+for bit, item in enumerate(string.ascii_letters):
+    ITEM_BITS[ord(item)] = 1 << bit
+# mask with every item type
+ALL_ITEMS = (1 << 52) - 1
+# same, as priorities indexed by character code (0 for anything that is not an item)
+PRIORITIES = np.zeros(256, dtype=np.uint8)
+PRIORITIES[np.frombuffer(string.ascii_letters.encode(), dtype=np.uint8)] = np.arange(1, 53)
+
+
+def item_mask(items: str) -> int:
+    """52-bit mask with the bits of all the item types in ``items``"""
+    mask = 0
+    for code in items.encode():
+        mask |= ITEM_BITS[code]
+
+    return mask
+
+
+def priority(mask: int) -> int:
+    """Priority of the item type with the lowest bit set in ``mask`` (0 if empty)"""
+    return (mask & -mask).bit_length()
+
+
+def find_badges(lines: typing.Iterable[str], group_size: int = 3) -> Iterator[int]:
+    """Yields the priority of the badge of every group of ``group_size`` rucksacks.
+
+    ``lines`` can be any iterable (an open file, for instance) and is consumed as it goes:
+    only the intersection of the current group is kept, so memory does not depend on the
+    amount of rucksacks.
+    """
+    if group_size < 1:
+        raise ValueError(f"group size must be a positive number, got {group_size}")
+
+    common, members = ALL_ITEMS, 0
+    for line in lines:
+        # line breaks and any other character that is not an item have no bit
+        common &= item_mask(line)
+        members += 1
+        if members == group_size:
+            yield priority(common)
+            common, members = ALL_ITEMS, 0
+
+    if members:
+        raise ValueError(f"last group only has {members} out of {group_size} rucksacks")
+
+
+def _encode(input: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Priorities of all the items in ``input``, the rucksack each one belongs to and the
+    offset at which every rucksack starts (plus a final one for the total of items)
+    """
+    buffer = np.frombuffer(input.encode(), dtype=np.uint8)
+    codes, breaks = PRIORITIES[buffer], buffer == ord("\n")
+    if not (keep := (codes > 0) | breaks).all():
+        # carriage returns, spaces, etc.
+        codes, breaks = codes[keep], breaks[keep]
+
+    ends = np.flatnonzero(breaks)
+    if codes.size and not breaks[-1]:
+        # last rucksack has no line break
+        ends = np.append(ends, codes.size)
+
+    # every line break shifts the items after it one position
+    offsets = np.concatenate(([0], ends - np.arange(ends.size)))
+    items = codes[~breaks]
+    rows = np.repeat(np.arange(ends.size), np.diff(offsets))
+    return items, rows, offsets
+
+
+def _presence(shape: tuple[int, ...], index: tuple[np.ndarray, ...]) -> np.ndarray:
+    """Boolean presence matrix with the 52 item types as last axis"""
+    presence = np.zeros(shape + (52,), dtype=np.bool_)
+    presence[index] = True
+    return presence
+
+
+def compartments_numpy(input: str) -> int:
+    """Sum of the priorities of the item types found in both compartments of each rucksack,
+    built from an ``N x 52`` presence matrix per compartment
+    """
+    items, rows, offsets = _encode(input)
+    rucksacks = offsets.size - 1
+    half = (np.diff(offsets) // 2)[rows]
+    first = np.arange(items.size) - offsets[rows] < half
+    common = _presence((rucksacks,), (rows[first], items[first] - 1)) & _presence(
+        (rucksacks,), (rows[~first], items[~first] - 1)
+    )
+    return int((common * np.arange(1, 53)).sum())
+
+
+def badges_numpy(input: str, group_size: int = 3) -> int:
+    """Sum of the priorities of the badges of every group of ``group_size`` rucksacks,
+    built from a ``groups x group_size x 52`` presence matrix
+    """
+    items, rows, offsets = _encode(input)
+    groups, members = divmod(offsets.size - 1, group_size)
+    if members:
+        raise ValueError(f"last group only has {members} out of {group_size} rucksacks")
+
+    presence = _presence((groups, group_size), (rows // group_size, rows % group_size, items - 1))
+    common = np.logical_and.reduce(presence, axis=1)
+    return int(((common.argmax(axis=1) + 1) * common.any(axis=1)).sum())
+
+
+class ItemIndex:
+    """Inverted index from every item type to the rucksacks (numbered from 0, in input
+    order) holding it.
+
+    It is built once in ``O(total items)`` from the presence matrix of all the rucksacks and
+    keeps, per item type, the sorted array of rucksack ids holding it plus the same set as a
+    packed bitset. Counting is ``O(1)`` per item type, listing the rucksacks of an item type
+    costs only the size of the answer, and combining item types takes a bitwise operation
+    over ``N / 8`` bytes instead of rescanning the items.
+    """
+
+    def __init__(self, input: str):
+        items, rows, offsets = _encode(input)
+        self.rucksacks = offsets.size - 1
+        presence = _presence((self.rucksacks,), (rows, items - 1)).T
+        self.counts = presence.sum(axis=1)
+        self._bounds = np.concatenate(([0], np.cumsum(self.counts)))
+        # np.nonzero goes row by row, so ids are grouped by item type and sorted
+        self._ids = np.nonzero(presence)[1]
+        self._bitsets = np.packbits(presence, axis=1)
+
+    @staticmethod
+    def _bit(item: str) -> int:
+        if len(item) != 1 or ord(item) > 255 or not PRIORITIES[ord(item)]:
+            raise ValueError(f'"{item}" is not an item type')
+
+        return int(PRIORITIES[ord(item)]) - 1
+
+    def count(self, item: str) -> int:
+        """Amount of rucksacks holding ``item``"""
+        return int(self.counts[self._bit(item)])
+
+    def rucksacks_with(self, item: str) -> np.ndarray:
+        """Sorted ids of the rucksacks holding ``item``"""
+        bit = self._bit(item)
+        return self._ids[self._bounds[bit] : self._bounds[bit + 1]]
+
+    def rucksacks_with_all(self, items: str) -> np.ndarray:
+        """Sorted ids of the rucksacks holding every item type in ``items``"""
+        bitset = np.bitwise_and.reduce(self._bitsets[[self._bit(item) for item in items]])
+        return np.flatnonzero(np.unpackbits(bitset, count=self.rucksacks))
+
+    def rucksacks_with_any(self, items: str) -> np.ndarray:
+        """Sorted ids of the rucksacks holding at least one item type in ``items``"""
+        bitset = np.bitwise_or.reduce(self._bitsets[[self._bit(item) for item in items]])
+        return np.flatnonzero(np.unpackbits(bitset, count=self.rucksacks))
+
+    def items_in_at_least(self, k: int) -> str:
+        """Item types held by ``k`` or more rucksacks, sorted by priority"""
+        return "".join(string.ascii_letters[bit] for bit in np.flatnonzero(self.counts >= k))
+
+
+def advent_p1(input: str, engine: Engine = Engine.NUMPY) -> str:
     """
     One Elf has the important job of loading all of the rucksacks with supplies for the jungle
     journey. Unfortunately, that Elf didn't quite follow the packing instructions, and so a few
@@ -68,18 +236,22 @@ def advent_p1(input: str) -> str:
     Find the item type that appears in both compartments of each rucksack.
     What is the sum of the priorities of those item types?
     """
-    data = input.splitlines()
-    repeated_items: list[str] = []
-    for rucksack in data:
-        sack_len = len(rucksack)
-        first_half, second_half = set(rucksack[: sack_len // 2]), set(rucksack[sack_len // 2 :])
-        if len(repeated := (first_half & second_half)) >= 1:
-            repeated_items.extend(repeated)
+    if engine is Engine.NUMPY:
+        return str(compartments_numpy(input))
 
-    return str(sum((ord(v.lower()) - 97 + (27 if v.isupper() else 1) for v in repeated_items)))
+    total = 0
+    for rucksack in input.splitlines():
+        half = len(rucksack) // 2
+        repeated = item_mask(rucksack[:half]) & item_mask(rucksack[half:])
+        while repeated:
+            total += priority(repeated)
+            # clear the lowest bit
+            repeated &= repeated - 1
 
+    return str(total)
 
-def advent_p2(input: str) -> str:
+
+def advent_p2(input: str, engine: Engine = Engine.NUMPY) -> str:
     """
     As you finish identifying the misplaced items, the Elves come to you with another issue.
 
@@ -121,16 +293,18 @@ def advent_p2(input: str) -> str:
     Find the item type that corresponds to the badges of each three-Elf group.
     What is the sum of the priorities of those item types?
     """
-    data = input.splitlines()
-    groups = ((set(data[i]), set(data[i + 1]), set(data[i + 2])) for i in range(0, len(data), 3))
-    repeated_items = ((s1 & s2 & s3).pop() for s1, s2, s3 in groups)
-    return str(sum((ord(v.lower()) - 97 + (27 if v.isupper() else 1) for v in repeated_items)))
+    if engine is Engine.NUMPY:
+        return str(badges_numpy(input))
+
+    return str(sum(find_badges(io.StringIO(input), 3)))
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) in {2, 3}, f"usage: {sys.argv[0]} INPUT_FILE [P1/P2]"
+    usage = f"usage: {sys.argv[0]} INPUT_FILE [P1/P2] [NUMPY/MASK]"
+    assert len(sys.argv) in {2, 3, 4}, usage
     file = Path(sys.argv[1])
-    part = Part(sys.argv[2]) if len(sys.argv) == 3 else Part.P1
+    part = Part(sys.argv[2]) if len(sys.argv) >= 3 else Part.P1
+    engine = Engine(sys.argv[3]) if len(sys.argv) == 4 else Engine.NUMPY
 
     assert file.exists(), f'input file "{file}" does not exist'
     assert file.is_file(), f'input file "{file}" is not a file'
@@ -144,6 +318,6 @@ if __name__ == "__main__":
             case _:
                 raise SystemError(f"Impossible pattern {part}")
 
-        print(fn(fd.read()))
+        print(fn(fd.read(), engine))
 
     sys.exit(0)
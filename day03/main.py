@@ -2,11 +2,15 @@
 # This file is a template: place it at "day**" and replace the specified function
 from __future__ import annotations
 
+import re
 import sys
 import typing
+from collections import namedtuple
 from enum import Enum
 from pathlib import Path
 
+import numpy as np
+
 if typing.TYPE_CHECKING:
     ...
 
@@ -16,7 +20,184 @@ class Part(Enum):
     P2 = "P2"
 
 
-def advent_p1(input: str) -> str:
+class Engine(Enum):
+    BOUNDS = "BOUNDS"
+    NUMPY = "NUMPY"
+
+
+# a whole "a-b,c-d" line (CRLF line endings are accepted too)
+ASSIGNMENT = re.compile(r"^\d+-\d+,\d+-\d+\r?$", re.MULTILINE)
+# turns "a-b,c-d" into "a b c d" so NumPy can read every number at once
+SEPARATORS = str.maketrans("-,", "  ")
+# inclusive range of section IDs assigned to an Elf
+Sections = namedtuple("Sections", ("start", "end"))
+# camp-wide view of the assignments: "union" and "redundant" are the (inclusive, sorted and
+# disjoint) ranges covered by at least one and by more than one Elf respectively, "covered"
+# and "redundant_sections" the amount of sections in them and "max_depth" the biggest amount
+# of Elves assigned to the same section
+Coverage = namedtuple(
+    "Coverage", ("union", "covered", "redundant", "redundant_sections", "max_depth")
+)
+
+
+def parse_input(input: str) -> list[tuple[Sections, Sections]]:
+    pairs: list[tuple[Sections, Sections]] = []
+    for line in input.splitlines():
+        p0, p1 = line.split(",")
+        p0, p1 = p0.split("-"), p1.split("-")
+        pairs.append((Sections(int(p0[0]), int(p0[1])), Sections(int(p1[0]), int(p1[1]))))
+
+    return pairs
+
+
+def contains(p0: Sections, p1: Sections) -> bool:
+    """Whether either range fully contains the other one"""
+    return (p0.start <= p1.start and p1.end <= p0.end) or (
+        p1.start <= p0.start and p0.end <= p1.end
+    )
+
+
+def overlaps(p0: Sections, p1: Sections) -> bool:
+    """Whether both ranges have at least one section in common"""
+    return p0.start <= p1.end and p1.start <= p0.end
+
+
+def parse_numpy(input: str) -> np.ndarray:
+    """All the assignments as an ``(N, 4)`` array of ``start0, end0, start1, end1`` rows.
+
+    Every line is checked against :data:`ASSIGNMENT` in a single regex scan, and then all
+    the numbers are read at once.
+    """
+    input = input.strip()
+    lines = input.count("\n") + 1 if input else 0
+    valid = len(ASSIGNMENT.findall(input))
+    if valid != lines:
+        raise ValueError(f"expected {lines} pairs of ranges, only {valid} lines are valid")
+    numbers = np.fromstring(input.translate(SEPARATORS), dtype=np.int64, sep=" ")
+
+    return numbers.reshape(-1, 4)
+
+
+def count_pairs_numpy(input: str) -> tuple[int, int]:
+    """Amount of pairs where a range fully contains the other one and amount of pairs whose
+    ranges overlap, both computed at once over all the pairs
+    """
+    s0, e0, s1, e1 = parse_numpy(input).T
+    contained = ((s0 <= s1) & (e1 <= e0)) | ((s1 <= s0) & (e0 <= e1))
+    overlapped = (s0 <= e1) & (s1 <= e0)
+    return int(contained.sum()), int(overlapped.sum())
+
+
+class SectionIndex:
+    """Index over the assignments of every Elf in the camp, numbered in input order (so the
+    Elves of the ``i``-th pair are ``2 * i`` and ``2 * i + 1``).
+
+    Assignments are sorted by their first section, and a segment tree over that order keeps
+    the last section of each subtree, so subtrees that end before a query range are pruned.
+    Subtrees that start after it are pruned as well, since they come after the last candidate
+    found with a binary search, so listing the ``k`` assignments overlapping a range only
+    visits the ``O(log n)`` paths leading to them. Counting them just takes two binary
+    searches (a range is overlapped by all the assignments starting before it ends but those
+    ending before it starts), which the bulk counts vectorize over all the probes.
+    """
+
+    def __init__(self, input: str):
+        assignments = parse_numpy(input).reshape(-1, 2)
+        order = np.argsort(assignments[:, 0], kind="stable")
+        self.elves = order.size
+        self._ids = order
+        self._starts = assignments[order, 0]
+        self._sorted_ends = np.sort(assignments[:, 1])
+
+        self._size = 1 << max(self.elves - 1, 0).bit_length()
+        tree = np.full(2 * self._size, np.iinfo(np.int64).min, dtype=np.int64)
+        tree[self._size : self._size + self.elves] = assignments[order, 1]
+        level = self._size // 2
+        while level:
+            nodes = np.arange(level, 2 * level)
+            tree[nodes] = np.maximum(tree[2 * nodes], tree[2 * nodes + 1])
+            level //= 2
+
+        # plain lists are way faster than arrays for single item accesses
+        self._tree = tree.tolist()
+
+    def overlapping(self, first: int, last: int) -> np.ndarray:
+        """Sorted ids of the Elves whose assignment shares a section with ``first-last``"""
+        limit = int(np.searchsorted(self._starts, last, side="right"))
+        found: list[int] = []
+        # nodes as (position in the tree, first leaf, amount of leaves)
+        pending = [(1, 0, self._size)]
+        while pending:
+            node, leaf, span = pending.pop()
+            if leaf >= limit or self._tree[node] < first:
+                continue
+
+            if span == 1:
+                found.append(leaf)
+            else:
+                span //= 2
+                pending.append((2 * node + 1, leaf + span, span))
+                pending.append((2 * node, leaf, span))
+
+        return np.sort(self._ids[found])
+
+    def covering(self, section: int) -> np.ndarray:
+        """Sorted ids of the Elves whose assignment includes ``section``"""
+        return self.overlapping(section, section)
+
+    def count_overlapping(self, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+        """Amount of Elves overlapping every ``first[i]-last[i]`` range"""
+        starting = np.searchsorted(self._starts, last, side="right")
+        ended = np.searchsorted(self._sorted_ends, first, side="left")
+        return starting - ended
+
+    def count_covering(self, sections: np.ndarray) -> np.ndarray:
+        """Amount of Elves covering every section in ``sections``"""
+        return self.count_overlapping(sections, sections)
+
+    def overlapping_many(self, ranges: typing.Iterable[tuple[int, int]]) -> list[np.ndarray]:
+        return [self.overlapping(first, last) for first, last in ranges]
+
+    def covering_many(self, sections: typing.Iterable[int]) -> list[np.ndarray]:
+        return [self.covering(section) for section in sections]
+
+
+def _runs(mask: np.ndarray, bounds: np.ndarray) -> tuple[list[Sections], int]:
+    """Merges the consecutive segments ``bounds[i]-bounds[i + 1]`` flagged in ``mask`` into
+    inclusive ranges, also returning the amount of sections in them
+    """
+    edges = np.flatnonzero(np.diff(mask, prepend=False, append=False))
+    firsts, lasts = bounds[edges[0::2]], bounds[edges[1::2]] - 1
+    runs = [Sections(int(first), int(last)) for first, last in zip(firsts, lasts)]
+    return runs, int((lasts - firsts + 1).sum())
+
+
+def coverage_report(input: str) -> Coverage:
+    """Sweeps over the endpoints of all the assignments in the camp.
+
+    Every range becomes a ``+1`` event at its first section and a ``-1`` one right after its
+    last section. Once events are sorted and merged per position, the running sum gives how
+    many Elves cover each segment between consecutive positions, so the cost is
+    ``O(n log n)`` no matter how wide the ranges are.
+    """
+    assignments = parse_numpy(input).reshape(-1, 2)
+    if assignments.size == 0:
+        return Coverage([], 0, [], 0, 0)
+
+    positions, events = np.unique(
+        np.concatenate((assignments[:, 0], assignments[:, 1] + 1)), return_inverse=True
+    )
+    deltas = np.zeros(positions.size, dtype=np.int64)
+    np.add.at(deltas, events, np.repeat([1, -1], assignments.shape[0]))
+    # depth of the segment from each position up to the next one
+    depth = np.cumsum(deltas)[:-1]
+
+    union, covered = _runs(depth > 0, positions)
+    redundant, redundant_sections = _runs(depth > 1, positions)
+    return Coverage(union, covered, redundant, redundant_sections, int(depth.max()))
+
+
+def advent_p1(input: str, engine: Engine = Engine.BOUNDS) -> str:
     """
     Space needs to be cleared before the last supplies can be unloaded from the ships,
     and so several Elves have been assigned the job of cleaning up sections of the camp.
@@ -74,24 +255,18 @@ def advent_p1(input: str) -> str:
 
     In how many assignment pairs does one range fully contain the other?
     """
-    data = input.splitlines()
-    pairs: list[tuple[set[int], set[int]]] = []
-    for line in data:
-        p0, p1 = line.split(",")
-        p0, p1 = p0.split("-"), p1.split("-")
-        pairs.append(
-            (set(range(int(p0[0]), int(p0[1]) + 1)), set(range(int(p1[0]), int(p1[1]) + 1)))
-        )
+    if engine is Engine.NUMPY:
+        return count_pairs_numpy(input)[0]
 
     fully_contained_pairs = 0
-    for p0, p1 in pairs:
-        if p0.issubset(p1) or p0.issuperset(p1):
+    for p0, p1 in parse_input(input):
+        if contains(p0, p1):
             fully_contained_pairs += 1
 
     return fully_contained_pairs
 
 
-def advent_p2(input: str) -> str:
+def advent_p2(input: str, engine: Engine = Engine.BOUNDS) -> str:
     """
     It seems like there is still quite a bit of duplicate work planned. Instead, the Elves would
     like to know the number of pairs that overlap at all.
@@ -108,27 +283,23 @@ def advent_p2(input: str) -> str:
 
     In how many assignment pairs do the ranges overlap?
     """
-    data = input.splitlines()
-    pairs: list[tuple[set[int], set[int]]] = []
-    for line in data:
-        p0, p1 = line.split(",")
-        p0, p1 = p0.split("-"), p1.split("-")
-        pairs.append(
-            (set(range(int(p0[0]), int(p0[1]) + 1)), set(range(int(p1[0]), int(p1[1]) + 1)))
-        )
+    if engine is Engine.NUMPY:
+        return count_pairs_numpy(input)[1]
 
     overlapped_ranges = 0
-    for p0, p1 in pairs:
-        if len(p0 & p1) >= 1:
+    for p0, p1 in parse_input(input):
+        if overlaps(p0, p1):
             overlapped_ranges += 1
 
     return overlapped_ranges
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) in {2, 3}, f"usage: {sys.argv[0]} INPUT_FILE [P1/P2]"
+    usage = f"usage: {sys.argv[0]} INPUT_FILE [P1/P2] [BOUNDS/NUMPY]"
+    assert len(sys.argv) in {2, 3, 4}, usage
     file = Path(sys.argv[1])
-    part = Part(sys.argv[2]) if len(sys.argv) == 3 else Part.P1
+    part = Part(sys.argv[2]) if len(sys.argv) >= 3 else Part.P1
+    engine = Engine(sys.argv[3]) if len(sys.argv) == 4 else Engine.BOUNDS
 
     assert file.exists(), f'input file "{file}" does not exist'
     assert file.is_file(), f'input file "{file}" is not a file'
@@ -142,6 +313,6 @@ if __name__ == "__main__":
             case _:
                 raise SystemError(f"Impossible pattern {part}")
 
-        print(fn(fd.read()))
+        print(fn(fd.read(), engine))
 
     sys.exit(0)
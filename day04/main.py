@@ -2,15 +2,16 @@
 # This file is a template: place it at "day**" and replace the specified function
 from __future__ import annotations
 
+import functools
+import re
+import string
 import sys
 import typing
-from collections import deque, namedtuple
 from enum import Enum
 from pathlib import Path
 
 import numpy as np
 from lark import Lark
-from numpy import ma
 
 if typing.TYPE_CHECKING:
     ...
@@ -21,43 +22,217 @@ class Part(Enum):
     P2 = "P2"
 
 
-# move <n> from <k> to <i>
-parser = Lark.open("grammar.lark", rel_to=__file__, parser="lalr")
-Moves = namedtuple("Moves", ("amount", "from_i", "to"))
+class Crane(Enum):
+    CM9000 = "9000"
+    CM9001 = "9001"
 
 
-def parse_input(input: str) -> tuple[list[deque[str]], list[Moves]]:
+class Parser(Enum):
+    FAST = "FAST"
+    STRICT = "STRICT"
+
+
+@functools.cache
+def get_parser() -> Lark:
+    """LALR parser for ``move <n> from <k> to <i>`` lines, only built when first needed.
+
+    Lark stores the compiled parse tables in the temporary directory (keyed by the grammar
+    and the parser options), so later runs load them instead of compiling the grammar again.
+    """
+    return Lark.open("grammar.lark", rel_to=__file__, parser="lalr", cache=True)
+
+
+# a whole "move <n> from <k> to <i>" line. As in ``grammar.lark``, spaces are ignored (so
+# any amount of them is fine, even none) and CRLF line endings are accepted too
+MOVE = re.compile(r"^ *move *\d+ *from *\d+ *to *\d+ *\r?$", re.MULTILINE)
+# a line with nothing but whitespace, which is skipped
+BLANK_LINE = re.compile(r"^[^\S\n]*$", re.MULTILINE)
+# turns the words of "move <n> from <k> to <i>" into spaces, so only the numbers are left
+MOVE_WORDS = str.maketrans(string.ascii_letters, " " * len(string.ascii_letters))
+
+
+def parse_moves(moves: str, mode: Parser = Parser.FAST) -> np.ndarray:
+    """Rearrangement procedure as an ``(N, 3)`` array of ``amount, from, to`` rows.
+
+    By default every line is checked against :data:`MOVE` in a single regex scan and then
+    the words are dropped and all the numbers are read at once. :attr:`Parser.STRICT`
+    parses every line with ``grammar.lark`` instead. Both accept the same input and skip
+    blank lines.
+    """
+    match mode:
+        case Parser.FAST:
+            moves = moves.strip()
+            lines = moves.count("\n") + 1 if moves else 0
+            valid = len(MOVE.findall(moves))
+            if valid != lines:
+                # blank lines are only looked for when the procedure is not just moves
+                lines -= len(BLANK_LINE.findall(moves))
+            if valid != lines:
+                raise ValueError(f"expected {lines} moves, only {valid} lines are valid")
+            numbers = np.fromstring(moves.translate(MOVE_WORDS), dtype=np.int64, sep=" ")
+        case Parser.STRICT:
+            numbers = np.array(
+                [
+                    [int(child.value) for child in get_parser().parse(move).children]
+                    for move in moves.splitlines()
+                    if move.strip()
+                ],
+                dtype=np.int64,
+            )
+        case _:
+            raise SystemError(f"Impossible pattern {mode}")
+
+    return numbers.reshape(-1, 3)
+
+
+def parse_drawing(drawing: str) -> list[str]:
+    """Crates of every stack in the drawing, from the bottom to the top.
+
+    The crate of the ``i``-th stack is always at column ``4 * i + 1`` of a row, so every
+    row is sliced once to get its crates (a space if there is none) and the rows are then
+    transposed into stacks, in a single linear pass and without intermediate grids.
+    """
+    # last line is only stack numbers, we only need it to know how many stacks there are
+    *rows, labels = drawing.splitlines()
+    stacks = len(labels.split())
+    layers = [row[1::4].ljust(stacks) for row in reversed(rows)]
+    return ["".join(stack).rstrip() for stack in zip(*layers)]
+
+
+def parse_input(input: str, mode: Parser = Parser.FAST) -> tuple[list[bytearray], np.ndarray]:
     matrix, moves = input.split("\n\n")
-    # last line is only row numbers, we don't need it
-    data = np.genfromtxt(
-        matrix.splitlines(),
-        delimiter=4,
-        dtype=str,
-        autostrip=True,
-        skip_footer=True,
-    )
-    # we need to clean-up the matrix, so remove "[] ". In addition, we transpose
-    # it so we have access to each crate per row, not per column. We also construct
-    # a masked array for invalid values (in this case, empty ones). Thus it will be
-    # easier to clean them up from Python lists.
-    #
-    # Note: we need stripped array to become an "object" array because string
-    # comparison does not work for NumPy str ndtype
-    data = ma.masked_equal(np.char.strip(data.T, "[]").astype(object), "")
-    # Finally, create final list with all "None" values removed (masked arrays
-    # return "None" for invalid values). We use "deque" because for pop/insert
-    # operations is faster than lists
-    data = [deque((value for value in row if value is not None)) for row in data.tolist()]
-
-    moves_list: list[Moves] = []
-    for move in moves.splitlines():
-        tree = parser.parse(move)
-        moves_list.append(Moves(*[int(child.value) for child in tree.children]))
-
-    return data, moves_list
-
-
-def advent_p1(input: str) -> str:
+    # every stack is a "bytearray" with the top crate at the end, so crates are moved by
+    # slicing whole runs of bytes instead of one by one
+    data = [bytearray(stack.encode()) for stack in parse_drawing(matrix)]
+
+    return data, parse_moves(moves, mode)
+
+
+def move(stacks: list[bytearray], amount: int, from_i: int, to: int, crane: Crane):
+    """Moves ``amount`` crates from stack ``from_i`` to stack ``to`` (both 1-based) with
+    a single slice copy: reversed for the CrateMover 9000, which moves crates one at a
+    time, and as is for the CrateMover 9001
+    """
+    source = stacks[from_i - 1]
+    if amount > len(source):
+        raise ValueError(f"cannot move {amount} crates from stack {from_i} ({len(source)} left)")
+    if amount == 0 or from_i == to:
+        # moving crates one by one to the very same stack leaves it as it was
+        return
+
+    picked = source[-amount:]
+    del source[-amount:]
+    stacks[to - 1] += picked[::-1] if crane is Crane.CM9000 else picked
+
+
+def rearrange(stacks: list[bytearray], moves: np.ndarray, crane: Crane) -> list[bytearray]:
+    """Runs the whole procedure over ``stacks`` (in place), returning them"""
+    for amount, from_i, to in moves.tolist():
+        move(stacks, amount, from_i, to, crane)
+
+    return stacks
+
+
+def top_crates(stacks: list[bytearray]) -> str:
+    return b"".join(stack[-1:] for stack in stacks).decode()
+
+
+def trace_top_crates(stacks: list[bytearray], moves: np.ndarray, crane: Crane) -> str:
+    """Top crates after the whole procedure, found without moving any crate.
+
+    Final heights only take adding up the amounts of every move. Then, starting from the top
+    slot of every final stack, moves are walked backwards keeping track of the stack and the
+    depth (from the top) of that slot: a move that dropped the slot's crate sends it back to
+    its source stack, at the mirrored depth for the CrateMover 9000, and any other move onto
+    or from the stack shifts the depth. The cost is ``O(moves x stacks)``, whatever the
+    amount of crates being moved.
+    """
+    moves_list = moves.tolist()
+    heights = [len(stack) for stack in stacks]
+    for amount, from_i, to in moves_list:
+        if amount > heights[from_i - 1]:
+            raise ValueError(f"cannot move {amount} crates from stack {from_i}")
+        heights[from_i - 1] -= amount
+        heights[to - 1] += amount
+
+    tops: list[str] = []
+    for stack, height in enumerate(heights):
+        if height == 0:
+            continue
+
+        depth = 0
+        for amount, from_i, to in reversed(moves_list):
+            if from_i == to:
+                continue
+            if stack == to - 1:
+                if depth < amount:
+                    stack = from_i - 1
+                    if crane is Crane.CM9000:
+                        depth = amount - 1 - depth
+                else:
+                    depth -= amount
+            elif stack == from_i - 1:
+                depth += amount
+
+        tops.append(chr(stacks[stack][-1 - depth]))
+
+    return "".join(tops)
+
+
+def final_state(
+    stacks: list[bytearray], moves: np.ndarray, crane: Crane, full: bool = False
+) -> str | list[bytes]:
+    """Top crates after the procedure, traced backwards, or the whole stacks (bottom crate
+    first) if ``full`` is requested, which needs the forward simulation
+    """
+    if not full:
+        return trace_top_crates(stacks, moves, crane)
+
+    return [bytes(stack) for stack in rearrange([stack.copy() for stack in stacks], moves, crane)]
+
+
+class Replay:
+    """Random access to the state of the stacks after any move of a procedure.
+
+    A single forward pass stores a snapshot of the stacks (one immutable ``bytes`` per stack)
+    every ``every`` moves, so the state after move ``k`` is rebuilt from the closest snapshot
+    before it, replaying less than ``every`` moves. Lower values of ``every`` make queries
+    faster at the cost of ``crates x moves / every`` bytes of snapshots.
+    """
+
+    def __init__(
+        self, stacks: list[bytearray], moves: np.ndarray, crane: Crane, every: int = 1000
+    ):
+        if every < 1:
+            raise ValueError(f"snapshots interval must be a positive number, got {every}")
+
+        self.crane = crane
+        self.every = every
+        self._moves = moves.tolist()
+        state = [stack.copy() for stack in stacks]
+        self._snapshots = [tuple(bytes(stack) for stack in state)]
+        for done, (amount, from_i, to) in enumerate(self._moves, start=1):
+            move(state, amount, from_i, to, crane)
+            if done % every == 0:
+                self._snapshots.append(tuple(bytes(stack) for stack in state))
+
+    def __len__(self) -> int:
+        return len(self._moves)
+
+    def state(self, k: int) -> list[bytes]:
+        """Stacks (bottom crate first) after the first ``k`` moves"""
+        if not 0 <= k <= len(self._moves):
+            raise IndexError(f"move {k} out of range, procedure has {len(self._moves)} moves")
+
+        snapshot = k // self.every
+        stacks = [bytearray(stack) for stack in self._snapshots[snapshot]]
+        for amount, from_i, to in self._moves[snapshot * self.every : k]:
+            move(stacks, amount, from_i, to, self.crane)
+
+        return [bytes(stack) for stack in stacks]
+
+
+def advent_p1(input: str, mode: Parser = Parser.FAST) -> str:
     """
     The expedition can depart as soon as the final supplies have been unloaded from the ships.
     Supplies are stored in stacks of marked crates, but because the needed supplies are buried
@@ -131,16 +306,11 @@ def advent_p1(input: str) -> str:
 
     After the rearrangement procedure completes, what crate ends up on top of each stack?
     """
-    crates, moves = parse_input(input)
-    for move in moves:
-        stack = crates[move.from_i - 1]
-        picked = (stack.popleft() for _ in range(move.amount))
-        crates[move.to - 1].extendleft(picked)
+    crates, moves = parse_input(input, mode)
+    return top_crates(rearrange(crates, moves, Crane.CM9000))
 
-    return "".join(crate.popleft() for crate in crates)
 
-
-def advent_p2(input: str) -> str:
+def advent_p2(input: str, mode: Parser = Parser.FAST) -> str:
     """
     As you watch the crane operator expertly rearrange the crates, you notice the process
     isn't following your prediction.
@@ -198,21 +368,16 @@ def advent_p2(input: str) -> str:
     they should stand to be ready to unload the final supplies. After the rearrangement procedure
     completes, what crate ends up on top of each stack?
     """
-    crates, moves = parse_input(input)
-    for move in moves:
-        stack = crates[move.from_i - 1]
-        picked = [stack.popleft() for _ in range(move.amount)]
-        # as items are insert in exactly the same order, just reverse the list before
-        # left-adding them
-        crates[move.to - 1].extendleft(picked[::-1])
-
-    return "".join(crate.popleft() for crate in crates)
+    crates, moves = parse_input(input, mode)
+    return top_crates(rearrange(crates, moves, Crane.CM9001))
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) in {2, 3}, f"usage: {sys.argv[0]} INPUT_FILE [P1/P2]"
+    usage = f"usage: {sys.argv[0]} INPUT_FILE [P1/P2] [FAST/STRICT]"
+    assert len(sys.argv) in {2, 3, 4}, usage
     file = Path(sys.argv[1])
-    part = Part(sys.argv[2]) if len(sys.argv) == 3 else Part.P1
+    part = Part(sys.argv[2]) if len(sys.argv) >= 3 else Part.P1
+    mode = Parser(sys.argv[3]) if len(sys.argv) == 4 else Parser.FAST
 
     assert file.exists(), f'input file "{file}" does not exist'
     assert file.is_file(), f'input file "{file}" is not a file'
@@ -226,6 +391,6 @@ if __name__ == "__main__":
             case _:
                 raise SystemError(f"Impossible pattern {part}")
 
-        print(fn(fd.read()))
+        print(fn(fd.read(), mode))
 
     sys.exit(0)